@@ -1,19 +1,262 @@
 ####
 # Ananonymizer API
 ###
+import asyncio
+import copy
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from hashlib import blake2b
 from fastapi import FastAPI
-from typing import Union
+from fastapi.responses import ORJSONResponse
+from typing import FrozenSet, List, Optional, Union
+from cachetools import LRUCache
 from pydantic import BaseModel
-from presidio_analyzer import AnalyzerEngine
+import spacy
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry, RecognizerResult
+from presidio_analyzer.nlp_engine import NerModelConfiguration, NlpEngineProvider, SpacyNlpEngine
 from presidio_anonymizer import AnonymizerEngine
 
-app = FastAPI()
+# The small model keeps per-worker memory low; the regex-based recognizers
+# (email, phone, credit card, ...) do not depend on it. Set SPACY_MODEL to
+# en_core_web_lg for better PERSON/LOCATION recall.
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+
+# Presidio only reads tokens, lemmas and entities from the spaCy doc, so the
+# dependency parser (and the sentence recognizer it makes redundant) is dead
+# weight on every request.
+SPACY_EXCLUDE = ["parser", "senter"]
+
+# Run the spaCy pipeline on the GPU. Requires a CUDA build of spaCy (cupy);
+# startup fails loudly if no GPU is available rather than silently using CPU.
+USE_GPU = os.getenv("PRESIDIO_USE_GPU") == "1"
+
+# Threads per process that run the analysis. One process should use every
+# core; when uvicorn runs one worker per core, set this to 1 instead.
+ANALYSIS_THREADS = int(os.getenv("ANALYSIS_THREADS", str(os.cpu_count() or 1)))
+if ANALYSIS_THREADS < 1:
+    raise ValueError(f"ANALYSIS_THREADS must be at least 1, got {ANALYSIS_THREADS}")
+
+# Number of texts fed through the spaCy pipeline at once by /anonymize_batch.
+# Presidio's batch analyzer calls nlp.pipe() without a batch size, so this is
+# set as the pipeline's own default.
+BATCH_SIZE = 32
+
+# Analyzer results for recently seen texts. Log and chat pipelines resend the
+# same strings a lot, and a hit skips both the spaCy pipeline and the regex
+# scans. Entries are keyed by a digest so the texts themselves are not kept.
+# A size of 0 (or less) disables the cache.
+ANALYZE_CACHE_SIZE = int(os.getenv("ANALYZE_CACHE_SIZE", "10000"))
+_analyze_cache: Optional[LRUCache] = (
+    LRUCache(maxsize=ANALYZE_CACHE_SIZE) if ANALYZE_CACHE_SIZE > 0 else None
+)
+_analyze_cache_lock = threading.Lock()
+
+# Entities whose recognizers can only match text containing an "@" or a
+# digit. When a text has neither, those recognizers are skipped entirely
+# instead of scanning the text for nothing.
+AT_SIGN_ENTITIES = frozenset({"EMAIL_ADDRESS"})
+DIGIT_ENTITIES = frozenset({
+    "CREDIT_CARD", "CRYPTO", "IBAN_CODE", "PHONE_NUMBER", "UK_NHS",
+    "US_BANK_NUMBER", "US_ITIN", "US_PASSPORT", "US_SSN",
+})
+_DIGIT = re.compile(r"\d")
+
+
+def create_nlp_engine() -> SpacyNlpEngine:
+    """
+    Load the spaCy pipeline without the components Presidio does not use.
+    """
+    if USE_GPU:
+        spacy.require_gpu()
+    # Keep Presidio's default entity mapping (conf/default.yaml), e.g. FAC to
+    # LOCATION, rather than the sparser built-in NerModelConfiguration.
+    ner_model_configuration = NerModelConfiguration.from_dict(
+        NlpEngineProvider().nlp_configuration["ner_model_configuration"]
+    )
+    nlp_engine = SpacyNlpEngine(
+        models=[{"lang_code": "en", "model_name": SPACY_MODEL}],
+        ner_model_configuration=ner_model_configuration,
+    )
+    nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    nlp.batch_size = BATCH_SIZE
+    nlp_engine.nlp = {"en": nlp}
+    return nlp_engine
+
+
+@lru_cache(maxsize=1)
+def get_analyzer() -> AnalyzerEngine:
+    """
+    Build the analyzer engine once per process.
+
+    The spaCy pipeline and the recognizer registry are the expensive parts,
+    so they are constructed a single time and shared by every request.
+    """
+    nlp_engine = create_nlp_engine()
+    registry = RecognizerRegistry()
+    registry.load_predefined_recognizers(nlp_engine=nlp_engine)
+    return AnalyzerEngine(nlp_engine=nlp_engine, registry=registry)
+
+
+@lru_cache(maxsize=1)
+def get_batch_analyzer() -> BatchAnalyzerEngine:
+    """
+    Wrap the shared analyzer so batches go through ``nlp.pipe``.
+    """
+    return BatchAnalyzerEngine(analyzer_engine=get_analyzer())
+
+
+@lru_cache(maxsize=1)
+def get_anonymizer() -> AnonymizerEngine:
+    """
+    Build the anonymizer engine once per process.
+    """
+    return AnonymizerEngine()
+
+
+@lru_cache(maxsize=1)
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool that runs the CPU-bound analysis off the event loop.
+
+    spaCy's heavy lifting happens in NumPy/BLAS, which releases the GIL, so
+    threads are enough to use several cores.
+    """
+    return ThreadPoolExecutor(max_workers=ANALYSIS_THREADS)
+
+
+def _cache_key(text: str) -> bytes:
+    return blake2b(text.encode(), digest_size=16).digest()
+
+
+@lru_cache(maxsize=8)
+def _supported_entities_without(
+    analyzer: AnalyzerEngine, skipped: FrozenSet[str]
+) -> List[str]:
+    return [
+        entity for entity in analyzer.get_supported_entities(language='en')
+        if entity not in skipped
+    ]
+
+
+def entities_to_analyze(analyzer: AnalyzerEngine, text: str) -> Optional[List[str]]:
+    """
+    Return the entities worth looking for in ``text``, or None for all of them.
+    """
+    skipped = frozenset()
+    if "@" not in text:
+        skipped |= AT_SIGN_ENTITIES
+    if not _DIGIT.search(text):
+        skipped |= DIGIT_ENTITIES
+    if not skipped:
+        return None
+    return _supported_entities_without(analyzer, skipped)
+
+
+def _cached_results(keys: List[bytes]) -> List[Optional[List[RecognizerResult]]]:
+    # The anonymizer merges overlapping results by editing them in place, so
+    # every caller gets its own copies and the cached entries stay pristine.
+    with _analyze_cache_lock:
+        entries = [_analyze_cache.get(key) for key in keys]
+    return [
+        None if entry is None else [copy.copy(result) for result in entry]
+        for entry in entries
+    ]
+
+
+def _cache_results(keys: List[bytes], batch_results: List[List[RecognizerResult]]) -> None:
+    entries = [tuple(copy.copy(result) for result in results) for results in batch_results]
+    with _analyze_cache_lock:
+        for key, entry in zip(keys, entries):
+            _analyze_cache[key] = entry
+
+
+def analyze_text(text: str) -> List[RecognizerResult]:
+    """
+    Analyze a single text, reusing the results of an identical earlier text.
+    """
+    if _analyze_cache is not None:
+        key = _cache_key(text)
+        results = _cached_results([key])[0]
+        if results is not None:
+            return results
+
+    analyzer = get_analyzer()
+    results = analyzer.analyze(
+        text=text, language='en', entities=entities_to_analyze(analyzer, text)
+    )
+    if _analyze_cache is not None:
+        _cache_results([key], [results])
+    return results
+
+
+def analyze_texts(texts: List[str]) -> List[List[RecognizerResult]]:
+    """
+    Analyze several texts, batching the NLP pipeline for the cache misses.
+    """
+    if _analyze_cache is None:
+        return get_batch_analyzer().analyze_iterator(texts=texts, language='en')
+
+    keys = [_cache_key(text) for text in texts]
+    batch_results = _cached_results(keys)
+
+    misses = [i for i, results in enumerate(batch_results) if results is None]
+    if misses:
+        computed = get_batch_analyzer().analyze_iterator(
+            texts=[texts[i] for i in misses], language='en'
+        )
+        for i, results in zip(misses, computed):
+            batch_results[i] = results
+        _cache_results([keys[i] for i in misses], computed)
+    return batch_results
+
+
+def anonymize_text(text: str) -> str:
+    """
+    Detect and replace the PII in a single text.
+    """
+    results = analyze_text(text)
+    if not results:
+        # Most texts contain no PII; skip building an anonymizer result.
+        return text
+    return get_anonymizer().anonymize(text=text, analyzer_results=results).text
+
+
+def anonymize_texts(texts: List[str]) -> List[str]:
+    """
+    Detect and replace the PII in several texts.
+    """
+    anonymizer = get_anonymizer()
+    return [
+        anonymizer.anonymize(text=text, analyzer_results=results).text
+        if results else text
+        for text, results in zip(texts, analyze_texts(texts))
+    ]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the engines before serving so the first request does not pay for
+    # loading the spaCy model. Analyzing a dummy text also makes Presidio
+    # compile and cache every recognizer's regex up front.
+    get_analyzer().analyze(text="warm up", language='en')
+    get_anonymizer()
+    get_executor()
+    yield
+    get_executor().shutdown()
+    get_executor.cache_clear()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 class Event(BaseModel):
     text: Union[str, None] = None
 
-anonymizer = AnonymizerEngine()
-analyzer = AnalyzerEngine()
+class BatchEvent(BaseModel):
+    texts: List[str] = []
 
 @app.get("/health")
 async def health() -> dict:
@@ -26,17 +269,39 @@ async def health() -> dict:
 async def anonymize_data(item: Event) -> dict:
     """
     Anonymize the provided text data.
-    
+
     Args:
         item (Event): The event containing the text to be anonymized.
-    
+
     Returns:
         dict: A dictionary containing the anonymized text.
     """
     text = item.text
     if text is None:
         return {"text": ""}
-    
-    results = analyzer.analyze(text=text, language='en')
-    anonymized_text = anonymizer.anonymize(text=text, analyzer_results=results)
-    return {"text": anonymized_text.text}
+
+    loop = asyncio.get_running_loop()
+    anonymized_text = await loop.run_in_executor(get_executor(), anonymize_text, text)
+    return {"text": anonymized_text}
+
+@app.post("/anonymize_batch")
+async def anonymize_batch(item: BatchEvent) -> dict:
+    """
+    Anonymize several texts in one call.
+
+    The texts are run through the spaCy pipeline in batches, which is
+    considerably faster than posting them one by one to ``/anonymize``.
+
+    Args:
+        item (BatchEvent): The event containing the texts to be anonymized.
+
+    Returns:
+        dict: A dictionary containing the anonymized texts, in input order.
+    """
+    texts = item.texts
+    if not texts:
+        return {"texts": []}
+
+    loop = asyncio.get_running_loop()
+    anonymized_texts = await loop.run_in_executor(get_executor(), anonymize_texts, texts)
+    return {"texts": anonymized_texts}
@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+@pytest.fixture(scope="session")
+def client():
+    # The lifespan is deliberately not entered: it would load the real spaCy
+    # model, and these tests mock the engines instead.
+    return TestClient(app)
+
+@pytest.fixture(scope="session")
+def live_client():
+    # Entering the client runs the lifespan, which loads the real engines.
+    # Session scope makes the slow tests share a single model load.
+    with TestClient(app) as live_client:
+        yield live_client
+
+@pytest.fixture
+def mock_analyzer(mocker):
+    return mocker.patch('main.get_analyzer').return_value
+
+@pytest.fixture
+def mock_batch_analyzer(mocker):
+    return mocker.patch('main.get_batch_analyzer').return_value
+
+@pytest.fixture
+def mock_anonymizer(mocker):
+    return mocker.patch('main.get_anonymizer').return_value
@@ -1,26 +1,174 @@
 import pytest
-from fastapi.testclient import TestClient
-from main import app, Event
+from cachetools import LRUCache
+from presidio_analyzer import RecognizerResult
+from presidio_anonymizer.entities import EngineResult
+import main
+from main import entities_to_analyze, get_analyzer, get_anonymizer
 
-client = TestClient(app)
+EMAIL_RESULT = RecognizerResult(entity_type="EMAIL_ADDRESS", start=0, end=4, score=1.0)
+ANONYMIZED_RESULT = EngineResult(text="anonymized text")
 
-def test_health():
+SUPPORTED_ENTITIES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER", "URL"]
+# What the prefilter keeps for text without an "@" or any digit.
+PLAIN_TEXT_ENTITIES = ["PERSON", "URL"]
+
+@pytest.fixture(autouse=True)
+def fresh_analyze_cache(monkeypatch):
+    # Independent of ANALYZE_CACHE_SIZE, which may disable the cache.
+    monkeypatch.setattr('main._analyze_cache', LRUCache(maxsize=128))
+
+def test_health(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
-def test_anonymize_data_empty_text():
+def test_anonymize_data_empty_text(client):
     response = client.post("/anonymize", json={"text": None})
     assert response.status_code == 200
     assert response.json() == {"text": ""}
 
-def test_anonymize_data_with_text(mocker):
-    mock_analyze = mocker.patch('main.analyzer.analyze', return_value=[])
-    mock_anonymize = mocker.patch('main.anonymizer.anonymize', return_value=Event(text="anonymized text"))
+@pytest.mark.parametrize("path, payload", [
+    ("/anonymize", {"text": 123}),
+    ("/anonymize", {"text": ["a list"]}),
+    ("/anonymize_batch", {"texts": "not a list"}),
+    ("/anonymize_batch", {"texts": [1, 2]}),
+    ("/anonymize_batch", {"texts": None}),
+])
+def test_anonymize_validation_errors(client, path, payload):
+    response = client.post(path, json=payload)
+    assert response.status_code == 422
+
+def test_anonymize_data_with_text(client, mock_analyzer, mock_anonymizer):
+    mock_analyzer.get_supported_entities.return_value = SUPPORTED_ENTITIES
+    mock_analyze = mock_analyzer.analyze
+    mock_analyze.return_value = [EMAIL_RESULT]
+    mock_anonymize = mock_anonymizer.anonymize
+    mock_anonymize.return_value = ANONYMIZED_RESULT
 
     response = client.post("/anonymize", json={"text": "some text"})
     assert response.status_code == 200
     assert response.json() == {"text": "anonymized text"}
 
-    mock_analyze.assert_called_once_with(text="some text", language='en')
-    mock_anonymize.assert_called_once()
\ No newline at end of file
+    mock_analyze.assert_called_once_with(
+        text="some text", language='en', entities=PLAIN_TEXT_ENTITIES
+    )
+    mock_anonymize.assert_called_once()
+
+def test_anonymize_data_without_pii_skips_anonymizer(client, mock_analyzer, mock_anonymizer):
+    mock_analyzer.analyze.return_value = []
+    mock_anonymize = mock_anonymizer.anonymize
+
+    response = client.post("/anonymize", json={"text": "nothing to hide"})
+    assert response.status_code == 200
+    assert response.json() == {"text": "nothing to hide"}
+
+    mock_anonymize.assert_not_called()
+
+def test_anonymize_data_reuses_cached_results(client, mock_analyzer, mock_anonymizer):
+    mock_analyzer.get_supported_entities.return_value = SUPPORTED_ENTITIES
+    mock_analyze = mock_analyzer.analyze
+    mock_analyze.return_value = [EMAIL_RESULT]
+    mock_anonymizer.anonymize.return_value = ANONYMIZED_RESULT
+
+    for _ in range(2):
+        response = client.post("/anonymize", json={"text": "repeated text"})
+        assert response.status_code == 200
+
+    mock_analyze.assert_called_once_with(
+        text="repeated text", language='en', entities=PLAIN_TEXT_ENTITIES
+    )
+    assert mock_anonymizer.anonymize.call_count == 2
+
+def test_cached_results_survive_anonymization(client, mock_analyzer):
+    # The anonymizer merges adjacent entities of the same type in place.
+    mock_analyzer.analyze.return_value = [
+        RecognizerResult(entity_type="PERSON", start=0, end=4, score=0.8),
+        RecognizerResult(entity_type="PERSON", start=5, end=10, score=0.8),
+    ]
+
+    for _ in range(2):
+        response = client.post("/anonymize", json={"text": "John Smith called"})
+        assert response.status_code == 200
+        assert response.json() == {"text": "<PERSON> called"}
+
+    mock_analyzer.analyze.assert_called_once()
+    (cached,) = main._analyze_cache.values()
+    assert [(r.start, r.end) for r in cached] == [(0, 4), (5, 10)]
+
+def test_anonymize_data_without_cache(client, monkeypatch, mock_analyzer, mock_anonymizer):
+    monkeypatch.setattr('main._analyze_cache', None)
+    mock_analyzer.analyze.return_value = [EMAIL_RESULT]
+    mock_anonymizer.anonymize.return_value = ANONYMIZED_RESULT
+
+    for _ in range(2):
+        response = client.post("/anonymize", json={"text": "repeated text"})
+        assert response.status_code == 200
+        assert response.json() == {"text": "anonymized text"}
+
+    assert mock_analyzer.analyze.call_count == 2
+
+def test_entities_to_analyze_skips_impossible_entities(mocker):
+    analyzer = mocker.Mock()
+    analyzer.get_supported_entities.return_value = ["PERSON", "EMAIL_ADDRESS", "CREDIT_CARD"]
+
+    assert entities_to_analyze(analyzer, "mail me at a@b.com before 5") is None
+    assert entities_to_analyze(analyzer, "order 4111 1111 1111 1111") == ["PERSON", "CREDIT_CARD"]
+    assert entities_to_analyze(analyzer, "plain words") == ["PERSON"]
+
+def test_anonymize_batch_empty(client):
+    response = client.post("/anonymize_batch", json={"texts": []})
+    assert response.status_code == 200
+    assert response.json() == {"texts": []}
+
+def test_anonymize_batch_with_texts(client, mock_batch_analyzer, mock_anonymizer):
+    mock_analyze_iterator = mock_batch_analyzer.analyze_iterator
+    mock_analyze_iterator.return_value = [[EMAIL_RESULT], []]
+    mock_anonymizer.anonymize.return_value = ANONYMIZED_RESULT
+
+    response = client.post("/anonymize_batch", json={"texts": ["one", "two"]})
+    assert response.status_code == 200
+    assert response.json() == {"texts": ["anonymized text", "two"]}
+
+    mock_analyze_iterator.assert_called_once_with(texts=["one", "two"], language='en')
+    mock_anonymizer.anonymize.assert_called_once()
+
+def test_anonymize_batch_mixes_cache_hits_and_misses(
+    client, mock_analyzer, mock_batch_analyzer, mock_anonymizer
+):
+    mock_analyzer.analyze.return_value = [EMAIL_RESULT]
+    mock_anonymizer.anonymize.side_effect = lambda text, **kwargs: EngineResult(text=f"<{text}>")
+    client.post("/anonymize", json={"text": "cached"})
+
+    mock_analyze_iterator = mock_batch_analyzer.analyze_iterator
+    mock_analyze_iterator.return_value = [[], [EMAIL_RESULT]]
+
+    response = client.post("/anonymize_batch", json={"texts": ["fresh a", "cached", "fresh b"]})
+    assert response.status_code == 200
+    assert response.json() == {"texts": ["fresh a", "<cached>", "<fresh b>"]}
+
+    mock_analyze_iterator.assert_called_once_with(texts=["fresh a", "fresh b"], language='en')
+
+def test_engines_are_cached():
+    assert get_anonymizer() is get_anonymizer()
+
+@pytest.mark.slow
+def test_analyzer_uses_default_entity_mapping(live_client):
+    ner_model_configuration = get_analyzer().nlp_engine.ner_model_configuration
+    assert ner_model_configuration.model_to_presidio_entity_mapping["FAC"] == "LOCATION"
+
+@pytest.mark.slow
+def test_anonymize_data_with_real_engines(live_client):
+    response = live_client.post("/anonymize", json={"text": "Write to john@example.com"})
+    assert response.status_code == 200
+    assert response.json() == {"text": "Write to <EMAIL_ADDRESS>"}
+
+@pytest.mark.slow
+def test_anonymize_batch_with_real_engines(live_client):
+    response = live_client.post(
+        "/anonymize_batch",
+        json={"texts": ["Write to john@example.com", "Nothing here", "Call 212-555-1234"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "texts": ["Write to <EMAIL_ADDRESS>", "Nothing here", "Call <PHONE_NUMBER>"]
+    }